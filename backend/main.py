@@ -1,27 +1,46 @@
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, StreamingResponse
-from pydantic import BaseModel, HttpUrl
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, HttpUrl, TypeAdapter, ValidationError
 import asyncio
+import httpx
 from typing import List
 import os
-import json
+import orjson
 import csv
 import io
+import itertools
+from operator import itemgetter
 
 # Use relative import
 try:
-    from .monitor import manager
+    from .monitor import manager, CHECK_INTERVAL, KEEPALIVE_EXPIRY, MAX_CONCURRENT_CHECKS
 except ImportError:
     # Fallback for direct execution
-    from monitor import manager
+    from monitor import manager, CHECK_INTERVAL, KEEPALIVE_EXPIRY, MAX_CONCURRENT_CHECKS
 
-app = FastAPI()
+# orjson-backed responses for the JSON API endpoints
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Pydantic model for input
 class WebsiteInput(BaseModel):
     url: HttpUrl
+    poll_interval: int = Field(CHECK_INTERVAL, ge=1)  # Seconds between checks
+
+# Removal tries the stored URL as-is first, so HttpUrl parsing is skipped
+# unless the client sent a URL that isn't in normalized form
+class WebsiteRemoveInput(BaseModel):
+    url: str
+
+http_url_adapter = TypeAdapter(HttpUrl)
+
+def normalize_url(url: str):
+    """Return the URL as POST would store it, or None if it isn't valid"""
+    try:
+        return str(http_url_adapter.validate_python(url))
+    except ValidationError:
+        return None
 
 # Serve static files for frontend
 # Ensure the frontend directory exists relative to this file
@@ -31,10 +50,50 @@ if not os.path.exists(frontend_path):
 
 app.mount("/static", StaticFiles(directory=frontend_path), name="static")
 
+# CSV export layout
+CSV_HEADER = (
+    "URL", "Status", "Is Up", "Response Time (ms)",
+    "Avg Response Time (ms)", "Uptime %", "Total Checks",
+    "Last Checked", "Created At"
+)
+csv_row = itemgetter(
+    "url", "status", "is_up", "response_time",
+    "avg_response_time", "uptime_percentage", "total_checks",
+    "last_checked", "created_at"
+)
+
+async def iter_csv_rows(websites):
+    """Yield the CSV export one row at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    
+    for row in itertools.chain((CSV_HEADER,), map(csv_row, websites)):
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
 @app.on_event("startup")
 async def startup_event():
-    # Start the monitoring loop in the background
+    # One long-lived client so keep-alive connections are reused across checks
+    manager.client = httpx.AsyncClient(
+        timeout=5.0,
+        follow_redirects=True,
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=100,
+            max_keepalive_connections=MAX_CONCURRENT_CHECKS,
+            keepalive_expiry=KEEPALIVE_EXPIRY
+        )
+    )
+    # Start the monitoring and broadcast loops in the background
     asyncio.create_task(manager.monitor_loop())
+    asyncio.create_task(manager.broadcast_loop())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if manager.client is not None:
+        await manager.client.aclose()
 
 @app.get("/")
 async def get_dashboard():
@@ -42,7 +101,7 @@ async def get_dashboard():
 
 @app.post("/api/websites")
 async def add_website(website: WebsiteInput):
-    success = manager.add_website(str(website.url))
+    success = manager.add_website(str(website.url), website.poll_interval)
     if not success:
         raise HTTPException(status_code=400, detail="Website already exists")
     await manager.notify_listeners()
@@ -53,8 +112,12 @@ async def get_websites():
     return manager.get_all_websites()
 
 @app.delete("/api/websites")
-async def remove_website(website: WebsiteInput):
-    success = manager.remove_website(str(website.url))
+async def remove_website(website: WebsiteRemoveInput):
+    success = manager.remove_website(website.url)
+    if not success:
+        # POST stores the normalized URL, e.g. with a trailing slash added
+        normalized = normalize_url(website.url)
+        success = normalized is not None and manager.remove_website(normalized)
     if not success:
         raise HTTPException(status_code=404, detail="Website not found")
     await manager.notify_listeners()
@@ -63,46 +126,16 @@ async def remove_website(website: WebsiteInput):
 @app.get("/api/statistics")
 async def get_statistics():
     """Get overall statistics for all monitored websites"""
-    websites = manager.get_all_websites()
-    
-    if not websites:
-        return {
-            "total_websites": 0,
-            "websites_up": 0,
-            "websites_down": 0,
-            "average_uptime": 0,
-            "average_response_time": 0,
-            "total_checks": 0
-        }
-    
-    total_websites = len(websites)
-    websites_up = sum(1 for w in websites if w["is_up"])
-    websites_down = total_websites - websites_up
-    average_uptime = sum(w["uptime_percentage"] for w in websites) / total_websites
-    
-    # Calculate average response time for sites that are up
-    response_times = [w["avg_response_time"] for w in websites if w["avg_response_time"] > 0]
-    average_response_time = sum(response_times) / len(response_times) if response_times else 0
-    
-    total_checks = sum(w["total_checks"] for w in websites)
-    
-    return {
-        "total_websites": total_websites,
-        "websites_up": websites_up,
-        "websites_down": websites_down,
-        "average_uptime": round(average_uptime, 2),
-        "average_response_time": round(average_response_time, 2),
-        "total_checks": total_checks
-    }
+    return manager.get_statistics()
 
 @app.get("/api/export/json")
 async def export_json():
     """Export all monitoring data as JSON"""
     data = manager.get_all_websites()
-    json_str = json.dumps(data, indent=2)
+    json_bytes = orjson.dumps(data, option=orjson.OPT_INDENT_2)
     
     return StreamingResponse(
-        iter([json_str]),
+        iter([json_bytes]),
         media_type="application/json",
         headers={"Content-Disposition": "attachment; filename=website-status-export.json"}
     )
@@ -112,34 +145,8 @@ async def export_csv():
     """Export monitoring data as CSV"""
     websites = manager.get_all_websites()
     
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header
-    writer.writerow([
-        "URL", "Status", "Is Up", "Response Time (ms)", 
-        "Avg Response Time (ms)", "Uptime %", "Total Checks", 
-        "Last Checked", "Created At"
-    ])
-    
-    # Write data
-    for site in websites:
-        writer.writerow([
-            site["url"],
-            site["status"],
-            site["is_up"],
-            site["response_time"],
-            site["avg_response_time"],
-            site["uptime_percentage"],
-            site["total_checks"],
-            site["last_checked"],
-            site["created_at"]
-        ])
-    
-    output.seek(0)
-    
     return StreamingResponse(
-        iter([output.getvalue()]),
+        iter_csv_rows(websites),
         media_type="text/csv",
         headers={"Content-Disposition": "attachment; filename=website-status-export.csv"}
     )
@@ -148,20 +155,18 @@ async def export_csv():
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
     
-    async def send_updates(data):
-        await websocket.send_json(data)
-    
-    manager.add_listener(send_updates)
+    manager.add_listener(websocket)
     
     try:
-        # Send initial state
-        await websocket.send_json(manager.get_all_websites())
-        while True:
-            # Keep connection open and handle potential client messages if needed
-            # For now we just push updates
-            await websocket.receive_text() 
+        # Send initial state; later updates are deltas
+        await websocket.send_bytes(manager.get_snapshot_payload())
+        # Updates are pushed from notify_listeners. The only thing we wait
+        # for here is the disconnect; any client messages are ignored.
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
     except WebSocketDisconnect:
-        manager.remove_listener(send_updates)
+        pass
     except Exception as e:
-        manager.remove_listener(send_updates)
         print(f"WebSocket error: {e}")
+    finally:
+        manager.remove_listener(websocket)
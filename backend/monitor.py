@@ -1,17 +1,57 @@
 
 import asyncio
+import heapq
 import httpx
+import itertools
+import orjson
+import time
+from collections import deque
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import List, Dict, Callable
+from urllib.parse import urlsplit
+from typing import Dict, List, Protocol, Set
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Maximum number of checks in flight; matches the client's keep-alive pool
+MAX_CONCURRENT_CHECKS = 20
+# Checks in flight against a single origin once it has a live connection.
+# HTTP/2 servers allow far more concurrent streams than this (usually 100+),
+# so these all multiplex over that one connection.
+MAX_CHECKS_PER_ORIGIN = 10
+# Seconds an idle pooled connection is kept open; also used for the client
+KEEPALIVE_EXPIRY = 30.0
+
+# Minimum seconds between websocket broadcasts of check results
+BROADCAST_INTERVAL = 0.25
+
+# Seconds a websocket send may take before that listener is dropped
+LISTENER_SEND_TIMEOUT = 5.0
+
+# Seconds a computed statistics summary may be reused
+STATS_CACHE_TTL = 1.0
+
+# Default seconds between checks, and the cap on back-off for failing sites
+CHECK_INTERVAL = 5
+MAX_BACKOFF = 60
+
 class Website:
-    def __init__(self, url: str):
+    __slots__ = (
+        "url", "origin_gate", "poll_interval", "prefers_head", "status", "response_time",
+        "last_checked", "is_up", "total_checks", "successful_checks",
+        "status_history", "response_times", "response_time_sum",
+        "created_at", "created_at_iso", "_cached_dict", "_dirty",
+        "next_check_at", "consecutive_failures"
+    )
+
+    def __init__(self, url: str, poll_interval: int = CHECK_INTERVAL):
         self.url = url
+        self.origin_gate = None  # Set by StatusManager.add_website
+        self.poll_interval = poll_interval
+        self.prefers_head = True  # Cleared if the server rejects HEAD
         self.status = "UNKNOWN"
         self.response_time = 0
         self.last_checked = None
@@ -19,9 +59,20 @@ class Website:
         # New features
         self.total_checks = 0
         self.successful_checks = 0
-        self.status_history = []  # List of status change events
-        self.response_times = []  # Track last 100 response times
+        self.status_history = deque(maxlen=50)  # Last 50 status change events
+        self.response_times = deque(maxlen=100)  # Track last 100 response times
+        self.response_time_sum = 0  # Running sum of response_times
         self.created_at = datetime.now()
+        self.created_at_iso = self.created_at.isoformat()  # Never changes
+        self._cached_dict = None  # Serialized state, cleared on every change
+        self._dirty = True  # Changed since the last websocket broadcast
+        # Scheduling (time.monotonic() based)
+        self.next_check_at = 0.0
+        self.consecutive_failures = 0
+
+    def _mark_changed(self):
+        self._cached_dict = None
+        self._dirty = True
 
     def calculate_uptime(self):
         """Calculate uptime percentage"""
@@ -31,37 +82,42 @@ class Website:
 
     def add_check_result(self, is_success: bool, response_time: int):
         """Record a check result"""
+        self._mark_changed()
         self.total_checks += 1
         if is_success:
             self.successful_checks += 1
         
         # Keep only last 100 response times
         if response_time > 0:
+            if len(self.response_times) == self.response_times.maxlen:
+                # The oldest value is about to be evicted by append
+                self.response_time_sum -= self.response_times[0]
             self.response_times.append(response_time)
-            if len(self.response_times) > 100:
-                self.response_times.pop(0)
+            self.response_time_sum += response_time
 
     def add_status_change(self, old_status: str, new_status: str):
         """Log a status change event"""
+        self._mark_changed()
         event = {
             "timestamp": datetime.now().isoformat(),
             "old_status": old_status,
             "new_status": new_status
         }
         self.status_history.append(event)
-        # Keep only last 50 events
-        if len(self.status_history) > 50:
-            self.status_history.pop(0)
 
     def get_average_response_time(self):
         """Calculate average response time from recent checks"""
         if not self.response_times:
             return 0
-        return int(sum(self.response_times) / len(self.response_times))
+        return self.response_time_sum // len(self.response_times)
 
     def to_dict(self):
-        return {
+        """Serialize state, reusing the cached dict until the next check"""
+        if self._cached_dict is not None:
+            return self._cached_dict
+        self._cached_dict = {
             "url": self.url,
+            "poll_interval": self.poll_interval,
             "status": self.status,
             "response_time": self.response_time,
             "last_checked": self.last_checked.isoformat() if self.last_checked else None,
@@ -69,105 +125,330 @@ class Website:
             "uptime_percentage": round(self.calculate_uptime(), 2),
             "total_checks": self.total_checks,
             "avg_response_time": self.get_average_response_time(),
-            "status_history": self.status_history[-10:],  # Last 10 events
-            "created_at": self.created_at.isoformat()
+            "status_history": list(itertools.islice(  # Last 10 events
+                self.status_history, max(0, len(self.status_history) - 10), None
+            )),
+            "created_at": self.created_at_iso
         }
+        return self._cached_dict
+
+class Listener(Protocol):
+    """Anything updates can be pushed to, e.g. a FastAPI WebSocket"""
+    async def send_bytes(self, data: bytes) -> None: ...
+    async def close(self, code: int = 1000) -> None: ...
+
+class OriginGate:
+    """Limits concurrent checks against one origin"""
+    __slots__ = ("sem", "probe", "last_attempt", "sites")
+
+    def __init__(self):
+        self.sem = asyncio.Semaphore(MAX_CHECKS_PER_ORIGIN)
+        self.probe = None  # Event set when the first request in flight finishes
+        self.last_attempt = None  # time.monotonic() when a check last finished
+        self.sites = 0  # Websites sharing this origin
+
+    def is_probed(self):
+        """Whether a check finished recently enough for its connection to be pooled"""
+        return (
+            self.last_attempt is not None
+            and time.monotonic() - self.last_attempt < KEEPALIVE_EXPIRY
+        )
+
+    @asynccontextmanager
+    async def slot(self):
+        async with self.sem:
+            if not self.is_probed():
+                if self.probe is None:
+                    # No connection yet: let one request through so the others
+                    # reuse its connection instead of each opening their own
+                    self.probe = asyncio.Event()
+                    try:
+                        yield
+                    finally:
+                        self.last_attempt = time.monotonic()
+                        self.probe.set()
+                        self.probe = None
+                    return
+                # Wait only while the probe is in flight; once it has finished,
+                # successfully or not, there is nothing more to gain by waiting
+                await self.probe.wait()
+            try:
+                yield
+            finally:
+                self.last_attempt = time.monotonic()
+
+def get_origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
 
 class StatusManager:
     def __init__(self):
         self.websites: Dict[str, Website] = {}
-        self.listeners: List[Callable] = []
+        self.listeners: Set[Listener] = set()
+        # Shared HTTP client, created on app startup so connections are reused
+        self.client: httpx.AsyncClient | None = None
+        self.sem = asyncio.Semaphore(MAX_CONCURRENT_CHECKS)
+        self._origin_gates: Dict[str, OriginGate] = {}
+        # Min-heap of (next_check_at, seq, website) driving monitor_loop
+        self._schedule = []
+        self._schedule_seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._check_tasks: Set[asyncio.Task] = set()  # Checks in flight
+        self._changed = asyncio.Event()  # Set when a check finishes
+        self._close_tasks: Set[asyncio.Task] = set()  # Dropped listeners closing
+        self._removed_urls: List[str] = []  # Removed since the last broadcast
+        self._stats_cache: tuple[float, dict] | None = None  # (computed_at, stats)
 
-    def add_website(self, url: str):
+    def add_website(self, url: str, poll_interval: int = CHECK_INTERVAL):
         if url not in self.websites:
-            self.websites[url] = Website(url)
+            website = Website(url, poll_interval)
+            gate = self._origin_gates.setdefault(get_origin(url), OriginGate())
+            gate.sites += 1
+            website.origin_gate = gate
+            self.websites[url] = website
+            self._schedule_check(website)
+            # Wake the monitor loop so the new site is checked right away
+            self._wakeup.set()
             logger.info(f"Added website: {url}")
             return True
         return False
 
     def remove_website(self, url: str):
         if url in self.websites:
-            del self.websites[url]
+            website = self.websites.pop(url)
+            # Drop the origin's gate once no remaining site uses it
+            website.origin_gate.sites -= 1
+            if website.origin_gate.sites == 0:
+                del self._origin_gates[get_origin(url)]
+            self._removed_urls.append(url)
             logger.info(f"Removed website: {url}")
             return True
         return False
 
+    def _schedule_check(self, website: Website):
+        heapq.heappush(
+            self._schedule,
+            (website.next_check_at, next(self._schedule_seq), website)
+        )
+
     def get_all_websites(self):
         return [site.to_dict() for site in self.websites.values()]
 
+    def get_statistics(self):
+        """Summary across all websites, cached briefly to absorb dashboard polls"""
+        now = time.monotonic()
+        if self._stats_cache is not None and now - self._stats_cache[0] < STATS_CACHE_TTL:
+            return self._stats_cache[1]
+        
+        websites = self.get_all_websites()
+        if not websites:
+            stats = {
+                "total_websites": 0,
+                "websites_up": 0,
+                "websites_down": 0,
+                "average_uptime": 0,
+                "average_response_time": 0,
+                "total_checks": 0
+            }
+        else:
+            websites_up = 0
+            total_uptime = 0
+            total_response_time = 0
+            response_time_count = 0  # Only sites that have a response time
+            total_checks = 0
+            for w in websites:
+                if w["is_up"]:
+                    websites_up += 1
+                total_uptime += w["uptime_percentage"]
+                if w["avg_response_time"] > 0:
+                    total_response_time += w["avg_response_time"]
+                    response_time_count += 1
+                total_checks += w["total_checks"]
+            
+            total_websites = len(websites)
+            average_response_time = (
+                total_response_time / response_time_count if response_time_count else 0
+            )
+            stats = {
+                "total_websites": total_websites,
+                "websites_up": websites_up,
+                "websites_down": total_websites - websites_up,
+                "average_uptime": round(total_uptime / total_websites, 2),
+                "average_response_time": round(average_response_time, 2),
+                "total_checks": total_checks
+            }
+        
+        self._stats_cache = (now, stats)
+        return stats
+
+    def get_snapshot_payload(self) -> bytes:
+        """Full state for a newly connected websocket client"""
+        return orjson.dumps({"type": "snapshot", "websites": self.get_all_websites()})
+
+    async def _fetch_status(self, website: Website) -> tuple[int, float]:
+        """Get the site's status code and response time (ms) without the body"""
+        if website.prefers_head:
+            start_time = time.perf_counter()
+            response = await self.client.head(website.url)
+            if response.status_code not in (405, 501):
+                return response.status_code, (time.perf_counter() - start_time) * 1000
+            # HEAD isn't supported here; go straight to GET from now on
+            website.prefers_head = False
+        # Time only the GET, so a rejected HEAD doesn't inflate the response time
+        start_time = time.perf_counter()
+        async with self.client.stream("GET", website.url) as response:
+            return response.status_code, (time.perf_counter() - start_time) * 1000
+
     async def check_website(self, website: Website):
-        old_status = website.status
-        old_is_up = website.is_up
+        # Take the per-origin slot first so waiting doesn't hold a global one
+        async with website.origin_gate.slot(), self.sem:
+            old_status = website.status
+            old_is_up = website.is_up
         
-        try:
-            async with httpx.AsyncClient(timeout=5.0, follow_redirects=True) as client:
-                start_time = datetime.now()
-                response = await client.get(website.url)
-                end_time = datetime.now()
-                
-                duration = (end_time - start_time).total_seconds() * 1000
+            try:
+                status_code, duration = await self._fetch_status(website)
+            
                 website.response_time = int(duration)
-                website.last_checked = end_time
-                
-                if 200 <= response.status_code < 400:
-                    website.status = f"{response.status_code} OK"
+                website.last_checked = datetime.now()
+            
+                if 200 <= status_code < 400:
+                    website.status = f"{status_code} OK"
                     website.is_up = True
                     website.add_check_result(True, website.response_time)
                 else:
-                    website.status = f"HTTP {response.status_code}"
+                    website.status = f"HTTP {status_code}"
                     website.is_up = False
                     website.add_check_result(False, website.response_time)
                     
-        except httpx.RequestError as e:
-            website.status = "DOWN"
-            website.is_up = False
-            website.response_time = 0
-            website.last_checked = datetime.now()
-            website.add_check_result(False, 0)
-            logger.error(f"Error checking {website.url}: {e}")
-        except Exception as e:
-            website.status = "ERROR"
-            website.is_up = False
-            website.response_time = 0
-            website.last_checked = datetime.now()
-            website.add_check_result(False, 0)
-            logger.error(f"Unexpected error checking {website.url}: {e}")
+            except httpx.RequestError as e:
+                website.status = "DOWN"
+                website.is_up = False
+                website.response_time = 0
+                website.last_checked = datetime.now()
+                website.add_check_result(False, 0)
+                logger.error(f"Error checking {website.url}: {e}")
+            except Exception as e:
+                website.status = "ERROR"
+                website.is_up = False
+                website.response_time = 0
+                website.last_checked = datetime.now()
+                website.add_check_result(False, 0)
+                logger.error(f"Unexpected error checking {website.url}: {e}")
+        
+            # Log status changes
+            if old_status != website.status or old_is_up != website.is_up:
+                website.add_status_change(old_status, website.status)
+                logger.info(f"Status change for {website.url}: {old_status} -> {website.status}")
         
-        # Log status changes
-        if old_status != website.status or old_is_up != website.is_up:
-            website.add_status_change(old_status, website.status)
-            logger.info(f"Status change for {website.url}: {old_status} -> {website.status}")
+            # Back off exponentially while the site keeps failing
+            if website.is_up:
+                website.consecutive_failures = 0
+                delay = website.poll_interval
+            else:
+                website.consecutive_failures += 1
+                # Clamp the exponent; the delay hits MAX_BACKOFF long before this
+                delay = min(
+                    website.poll_interval * 2 ** min(website.consecutive_failures, 16),
+                    max(website.poll_interval, MAX_BACKOFF)
+                )
+            website.next_check_at = time.monotonic() + delay
+
+    async def _run_check(self, website: Website):
+        try:
+            await self.check_website(website)
+        finally:
+            # Put the site back on the schedule unless it was removed meanwhile
+            if self.websites.get(website.url) is website:
+                self._schedule_check(website)
+            self._wakeup.set()
+            self._changed.set()
 
     async def monitor_loop(self):
         logger.info("Starting monitor loop...")
         while True:
-            tasks = [self.check_website(site) for site in self.websites.values()]
-            if tasks:
-                await asyncio.gather(*tasks)
-                await self.notify_listeners()
+            # Start every due check as its own task; each one reschedules its
+            # site when it finishes, so slow sites don't hold up the others
+            now = time.monotonic()
+            while self._schedule and self._schedule[0][0] <= now:
+                website = heapq.heappop(self._schedule)[2]
+                # Skip entries for sites removed since they were scheduled
+                if self.websites.get(website.url) is website:
+                    task = asyncio.create_task(self._run_check(website))
+                    self._check_tasks.add(task)
+                    task.add_done_callback(self._check_tasks.discard)
             
-            await asyncio.sleep(5)  # Check every 5 seconds
+            # Sleep until the next site is due, a site is added or a check finishes
+            timeout = self._schedule[0][0] - now if self._schedule else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def broadcast_loop(self):
+        """Push finished checks to listeners, batched per BROADCAST_INTERVAL"""
+        while True:
+            await self._changed.wait()
+            self._changed.clear()
+            await self.notify_listeners()
+            # Let results pile up so many checks go out in one delta
+            await asyncio.sleep(BROADCAST_INTERVAL)
 
     async def notify_listeners(self):
-        data = self.get_all_websites()
+        # Only send sites that changed since the last broadcast
+        updated = []
+        for site in self.websites.values():
+            if site._dirty:
+                site._dirty = False
+                updated.append(site.to_dict())
+        removed, self._removed_urls = self._removed_urls, []
+        if not updated and not removed:
+            return
+        # State changed, so recompute statistics on the next request
+        self._stats_cache = None
+        
+        # Encode once and hand the same payload to every listener
+        payload = orjson.dumps({"type": "delta", "updated": updated, "removed": removed})
+        # Snapshot the listeners; they may come and go while we await
+        listeners = list(self.listeners)
+        # Send concurrently so one slow client doesn't hold up the rest, and
+        # give up on clients that stall rather than waiting on them forever
+        results = await asyncio.gather(
+            *(
+                asyncio.wait_for(listener.send_bytes(payload), LISTENER_SEND_TIMEOUT)
+                for listener in listeners
+            ),
+            return_exceptions=True
+        )
+        
         to_remove = []
-        for listener in self.listeners:
-            try:
-                await listener(data)
-            except Exception as e:
-                logger.error(f"Error notifying listener: {e}")
+        for listener, result in zip(listeners, results):
+            if isinstance(result, asyncio.TimeoutError):
+                logger.error("Error notifying listener: send timed out")
+                to_remove.append(listener)
+            elif isinstance(result, Exception):
+                logger.error(f"Error notifying listener: {result}")
                 to_remove.append(listener)
         
+        self.listeners.difference_update(to_remove)
+        # Close dropped connections so the client notices and reconnects
+        # instead of sitting on a dashboard that no longer updates
         for listener in to_remove:
-            if listener in self.listeners:
-                self.listeners.remove(listener)
+            task = asyncio.create_task(self._close_listener(listener))
+            self._close_tasks.add(task)
+            task.add_done_callback(self._close_tasks.discard)
+
+    async def _close_listener(self, listener: Listener):
+        try:
+            await asyncio.wait_for(listener.close(code=1011), LISTENER_SEND_TIMEOUT)
+        except Exception as e:
+            logger.error(f"Error closing listener: {e!r}")
 
-    def add_listener(self, listener: Callable):
-        self.listeners.append(listener)
+    def add_listener(self, listener: Listener):
+        self.listeners.add(listener)
 
-    def remove_listener(self, listener: Callable):
-        if listener in self.listeners:
-            self.listeners.remove(listener)
+    def remove_listener(self, listener: Listener):
+        self.listeners.discard(listener)
 
 # Singleton instance
 manager = StatusManager()
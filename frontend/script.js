@@ -7,28 +7,50 @@ const exportJsonBtn = document.getElementById('exportJsonBtn');
 const exportCsvBtn = document.getElementById('exportCsvBtn');
 
 let allWebsites = [];
+const websitesByUrl = new Map();
 let searchTerm = '';
 
 // Connect to WebSocket
 const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
 const wsUrl = `${protocol}//${window.location.host}/ws`;
-const ws = new WebSocket(wsUrl);
+const RECONNECT_DELAY_MS = 2000;
+const textDecoder = new TextDecoder();
 
-ws.onmessage = (event) => {
-    const data = JSON.parse(event.data);
-    allWebsites = data;
-    renderWebsites(filterWebsites());
-    updateStatistics();
-};
+function connect() {
+    const ws = new WebSocket(wsUrl);
+    // Updates are sent as binary JSON frames
+    ws.binaryType = 'arraybuffer';
 
-ws.onopen = () => {
-    console.log('Connected to WebSocket');
-};
+    ws.onmessage = (event) => {
+        const text = typeof event.data === 'string' ? event.data : textDecoder.decode(event.data);
+        const message = JSON.parse(text);
 
-ws.onclose = () => {
-    console.log('Disconnected from WebSocket');
-    // Optional: Implement reconnect logic here
-};
+        if (message.type === 'snapshot') {
+            websitesByUrl.clear();
+            message.websites.forEach(site => websitesByUrl.set(site.url, site));
+        } else if (message.type === 'delta') {
+            message.removed.forEach(url => websitesByUrl.delete(url));
+            message.updated.forEach(site => websitesByUrl.set(site.url, site));
+        }
+
+        allWebsites = Array.from(websitesByUrl.values());
+        renderWebsites(filterWebsites());
+        scheduleStatisticsUpdate();
+    };
+
+    ws.onopen = () => {
+        console.log('Connected to WebSocket');
+    };
+
+    ws.onclose = () => {
+        // The server closes clients that fall behind; a fresh connection
+        // starts again from a full snapshot
+        console.log('Disconnected from WebSocket, reconnecting...');
+        setTimeout(connect, RECONNECT_DELAY_MS);
+    };
+}
+
+connect();
 
 addBtn.addEventListener('click', addWebsite);
 urlInput.addEventListener('keypress', (e) => {
@@ -118,6 +140,18 @@ function filterWebsites() {
     );
 }
 
+// Refresh statistics at most once per interval, however many updates arrive
+const STATISTICS_REFRESH_MS = 1000;
+let statisticsTimer = null;
+
+function scheduleStatisticsUpdate() {
+    if (statisticsTimer !== null) return;
+    statisticsTimer = setTimeout(() => {
+        statisticsTimer = null;
+        updateStatistics();
+    }, STATISTICS_REFRESH_MS);
+}
+
 async function updateStatistics() {
     try {
         const response = await fetch('/api/statistics');